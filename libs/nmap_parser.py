@@ -1,47 +1,103 @@
-from typing import Dict, List, Generator
+from typing import Dict, List, Generator, Optional
 import xml.etree.ElementTree as ET
 
 
-def parse_nmap_xml(xml_path: str) -> Generator[Dict, None, None]:
-    """Parse Nmap XML and yield host dicts:
-    {"ip": "x.x.x.x", "ports": [{"port": int, "protocol": "tcp", "service": "ftp", "product": "..."}]}
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_host(host: ET.Element) -> Optional[Dict]:
+    """Convert a finished <host> element into a host dict, or None if it has
+    no usable address or no open ports.
     """
-    tree = ET.parse(xml_path)
-    root = tree.getroot()
-
-    for host in root.findall('host'):
-        ip = None
-        for addr in host.findall('address'):
-            addrtype = addr.get('addrtype', '')
-            if addrtype in ('ipv4', 'ipv6'):
-                ip = addr.get('addr')
-                break
-        if not ip:
-            continue
+    ip = None
+    for addr in host.findall('address'):
+        addrtype = addr.get('addrtype', '')
+        if addrtype in ('ipv4', 'ipv6'):
+            ip = addr.get('addr')
+            break
+    if not ip:
+        return None
 
-        ports_node = host.find('ports')
-        if ports_node is None:
+    ports_node = host.find('ports')
+    if ports_node is None:
+        return None
+
+    ports = []
+    for port in ports_node.findall('port'):
+        state = port.find('state')
+        if state is None or state.get('state') != 'open':
+            continue
+        try:
+            portid = int(port.get('portid'))
+        except Exception:
             continue
+        protocol = port.get('protocol', 'tcp')
+        svc = port.find('service')
+        service = svc.get('name') if svc is not None and svc.get('name') else ''
+        product = svc.get('product') if svc is not None and svc.get('product') else ''
+        version = svc.get('version') if svc is not None and svc.get('version') else ''
+        ports.append({'port': portid, 'protocol': protocol, 'service': service.lower(), 'product': product,
+                      'version': version})
+
+    if not ports:
+        return None
+    return {'ip': ip, 'ports': ports}
+
+
+class NmapStreamParser:
+    """Incremental Nmap XML parser.
 
-        ports = []
-        for port in ports_node.findall('port'):
-            state = port.find('state')
-            if state is None or state.get('state') != 'open':
+    Feed it raw bytes as they are written (e.g. from a scan still in progress)
+    and it returns host dicts for every <host> element completed so far.
+    Finished elements are discarded so memory stays flat on large scans.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._depth = 0
+
+    def feed(self, data: bytes) -> List[Dict]:
+        """Feed more XML and return the host dicts completed by it.
+        Raises xml.etree.ElementTree.ParseError on malformed input.
+        """
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> List[Dict]:
+        """Signal end of input. Raises ParseError if the document is incomplete."""
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> List[Dict]:
+        hosts = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                if self._root is None:
+                    self._root = elem
+                self._depth += 1
                 continue
-            try:
-                portid = int(port.get('portid'))
-            except Exception:
+            self._depth -= 1
+            # only finished top-level children (nmaprun/host, nmaprun/taskprogress, ...)
+            if self._depth != 1:
                 continue
-            protocol = port.get('protocol', 'tcp')
-            svc = port.find('service')
-            service = svc.get('name') if svc is not None and svc.get('name') else ''
-            product = svc.get('product') if svc is not None and svc.get('product') else ''
-            version = svc.get('version') if svc is not None and svc.get('version') else ''
-            ports.append({'port': portid, 'protocol': protocol, 'service': service.lower(), 'product': product,
-                          'version': version})
-
-        if ports:
-            yield {'ip': ip, 'ports': ports}
+            if elem.tag == 'host':
+                host = _parse_host(elem)
+                if host:
+                    hosts.append(host)
+            self._root.remove(elem)
+        return hosts
+
+
+def parse_nmap_xml(xml_path: str) -> Generator[Dict, None, None]:
+    """Parse Nmap XML and yield host dicts:
+    {"ip": "x.x.x.x", "ports": [{"port": int, "protocol": "tcp", "service": "ftp", "product": "..."}]}
+    """
+    parser = NmapStreamParser()
+    with open(xml_path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            yield from parser.feed(chunk)
+    yield from parser.close()
 
 
 if __name__ == '__main__':
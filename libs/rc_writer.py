@@ -2,8 +2,8 @@
 """rc_writer.py
 Functions to assemble the .rc content and write it to disk.
 """
-from typing import Dict, List, Any
-from libs.module_lookup import find_modules_for_service
+from typing import Dict, List, Any, Iterable, Optional
+from libs.scheduler import build_schedule, find_unmapped_services, resolve_tier_limits
 import fontstyle
 
 
@@ -29,75 +29,118 @@ def _styled(text: str, style: str) -> str:
     return text
 
 
-def generate_rc_for_host(host: Dict[str, Any], lookup: Dict[str, List[Dict[str, Any]]]) -> str:
-    """Return the rc text for a single host dict as produced by nmap_parser.parse_nmap_xml"""
-    ip = host['ip']
+def _module_lines(mod: Dict[str, Any], ip: str) -> List[str]:
+    """Return the `use`/`set` lines for a module descriptor (without the run command)."""
+    lines = [f"use {mod.get('module')}"]
+    use_setg = bool(mod.get('use_setg', True))
+    rhost_param = mod.get('rhost_param', 'RHOSTS')
+    if not use_setg:
+        if rhost_param.upper() == 'RHOSTS':
+            lines.append(f"set RHOSTS {ip}")
+        else:
+            lines.append(f"set RHOST {ip}")
+    extra = mod.get('extra_options', {}) or {}
+    for opt, val in extra.items():
+        lines.append(f"set {opt} {val}")
+    return lines
+
+
+def _run_command(mod: Dict[str, Any]) -> str:
+    """Return the background run command for a module descriptor."""
+    return 'exploit -j' if mod.get('action', 'run') == 'exploit' else 'run -j'
+
+
+def generate_rc_for_tier(tier: str, entries: List[Dict[str, Any]], concurrency: int, timeout: int) -> str:
+    """Return the rc text for one risk tier as produced by scheduler.build_schedule.
+
+    Module launches are throttled to `concurrency` running jobs. When `timeout`
+    is set, launches stop once the tier's time budget is spent and any jobs
+    still running at the end of the tier are killed before the next tier starts.
+    Only jobs started by this tier are counted, waited on and stopped, so
+    unrelated jobs (e.g. an exploit/multi/handler listener) are left alone.
+    """
+    budget = f"{timeout}s" if timeout else "none"
     lines: List[str] = []
-    lines.append(f"# ---------- Host: {ip} ----------")
-    print(_styled(f"\n\n\r\r ---------- Host: {ip} ----------", "magenta/bold"))
-    lines.append(f"setg RHOSTS {ip}")
-    lines.append(f"setg RHOST {ip}")
+    lines.append(f"# ========== Tier: {tier} (max jobs: {concurrency}, time budget: {budget}) ==========")
+    print(_styled(f"\n\n\r\r ========== Tier: {tier} (max jobs: {concurrency}, time budget: {budget}) ==========", "yellow/bold"))
+    # globals survive across <ruby> blocks within the same resource script
+    lines.append('<ruby>')
+    lines.append(f"$nmap2msf_deadline = Time.now + {timeout}" if timeout else "$nmap2msf_deadline = nil")
+    lines.append("$nmap2msf_jobs = []")
+    lines.append('</ruby>')
     lines.append('')
+    in_budget = "($nmap2msf_deadline.nil? || Time.now < $nmap2msf_deadline)"
+    # ids of this tier's jobs that are still running
+    tier_jobs = "($nmap2msf_jobs & framework.jobs.keys)"
 
-    seen_module_port = set()
-
-    for p in host['ports']:
-        port = p['port']
-        svc = p.get('service', '')
-        prod = p.get('product', '')
-        lines.append(f"# service: {svc} port: {port} product: {prod}")
-        print(_styled(f"\n\r[*] service: {svc}; port: {port}; product: {prod}", "cyan"))
-
-        # print(svc, port, prod)
-        modules = find_modules_for_service(lookup, svc)
-        # print(modules)
-        if not modules:
-            lines.append(f"# No module mapping found for service '{svc}' — skipping")
-            print(_styled(f"[-] No module mapping found for service '{svc}' — skipping", "red/bold"))
+    current_ip = None
+    for entry in entries:
+        ip = entry['ip']
+        port = entry['port']
+        mod = entry['module']
+        if ip != current_ip:
+            current_ip = ip
+            lines.append(f"# ---------- Host: {ip} ----------")
+            print(_styled(f"\n\r ---------- Host: {ip} ----------", "magenta/bold"))
+            lines.append(f"setg RHOSTS {ip}")
+            lines.append(f"setg RHOST {ip}")
             lines.append('')
-            continue
-        lines.append(f"set RPORT {port}")
-        for mod in modules:
-            module_path = mod.get('module')
-            module_flag = mod.get('flag')
-            # avoid repeating identical module+port combos
-            key = (module_path, port)
-            if key in seen_module_port:
-                continue
-            seen_module_port.add(key)
 
-            lines.append('')
-            # lines.append(f"# Module: {module_path}")
-            lines.append(f"use {module_path}")
-            print(_styled(f"[+] Using module {module_path} (Flag: {module_flag})", "green/bold"))
-
-            use_setg = bool(mod.get('use_setg', True))
-            rhost_param = mod.get('rhost_param', 'RHOSTS')
-            if not use_setg:
-                if rhost_param.upper() == 'RHOSTS':
-                    lines.append(f"set RHOSTS {ip}")
-                else:
-                    lines.append(f"set RHOST {ip}")
-            extra = mod.get('extra_options', {}) or {}
-            for opt, val in extra.items():
-                lines.append(f"set {opt} {val}")
-            action = mod.get('action', 'run')
-            if action == 'exploit':
-                lines.append('exploit -j')
-            else:
-                lines.append('run -j')
+        lines.append(f"# service: {entry['service']} port: {port} product: {entry['product']}")
+        module_lines = _module_lines(mod, ip)
+        # set RPORT after `use` so it lands on this module's datastore
+        lines.append(module_lines[0])
+        lines.append(f"set RPORT {port}")
+        lines.extend(module_lines[1:])
+        print(_styled(f"[+] Using module {mod.get('module')} on port {port} (Flag: {mod.get('flag')})", "green/bold"))
+        lines.append('<ruby>')
+        lines.append(f"sleep(1) while {tier_jobs}.length >= {concurrency} && {in_budget}")
+        lines.append(f"if {in_budget}")
+        lines.append("  before = framework.jobs.keys")
+        lines.append(f"  run_single('{_run_command(mod)}')")
+        lines.append("  $nmap2msf_jobs.concat(framework.jobs.keys - before)")
+        lines.append("end")
+        lines.append('</ruby>')
         lines.append('')
 
-    lines.append('# ---------- done with host ----------')
+    # drain the tier before moving on, killing stragglers once the budget is spent
+    lines.append('<ruby>')
+    lines.append(f"sleep(1) while !{tier_jobs}.empty? && {in_budget}")
+    lines.append(f"{tier_jobs}.each {{ |id| framework.jobs.stop_job(id) }}")
+    lines.append('</ruby>')
+    lines.append(f"# ========== done with tier: {tier} ==========")
     lines.append('')
     return '\n'.join(lines)
 
 
+def write_rc(
+    hosts: List[Dict[str, Any]],
+    lookup: Dict[str, List[Dict[str, Any]]],
+    out_path: str,
+    flags: Optional[Iterable[str]] = None,
+    tier_limits: Optional[Dict[str, Dict[str, int]]] = None
+):
+    """Write the .rc with modules ordered by risk tier across all hosts.
 
-def write_rc(hosts: List[Dict[str, Any]], lookup: Dict[str, List[Dict[str, Any]]], out_path: str):
+    `flags` restricts which tiers are emitted (default: all) and `tier_limits`
+    maps tier -> {"concurrency", "timeout"} (default: scheduler.DEFAULT_TIER_LIMITS).
+    """
+    limits = tier_limits if tier_limits is not None else resolve_tier_limits()
+    schedule = build_schedule(hosts, lookup, flags)
+    unmapped = find_unmapped_services(hosts, lookup)
+    for entry in unmapped:
+        print(_styled(f"[-] No module mapping found for service '{entry['service']}' "
+                      f"({entry['ip']}:{entry['port']}) — skipping", "red/bold"))
+    if not schedule:
+        print(_styled("[-] No modules matched the selected flags", "red/bold"))
     with open(out_path, 'w', encoding='utf-8') as fh:
         fh.write('# Metasploit .rc generated from Nmap XML\n')
         fh.write('# Generated by msf_rc_generator\n\n')
-        for h in hosts:
-            fh.write(generate_rc_for_host(h, lookup))
+        for entry in unmapped:
+            fh.write(f"# No module mapping found for service '{entry['service']}' "
+                     f"({entry['ip']}:{entry['port']}) — skipping\n")
+        if unmapped:
+            fh.write('\n')
+        for tier, entries in schedule:
+            fh.write(generate_rc_for_tier(tier, entries, limits[tier]['concurrency'], limits[tier]['timeout']))
     return out_path
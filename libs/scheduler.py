@@ -0,0 +1,116 @@
+"""scheduler.py
+Group lookup modules into risk tiers (by their `flag`) and order them so
+cheap enumeration runs network-wide before slower, noisier modules.
+"""
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+from libs.module_lookup import find_modules_for_service
+
+# Tiers run in this order: all `safe` modules across every host, then `vuln`,
+# then `bruteforce`.
+TIER_ORDER = ('safe', 'vuln', 'bruteforce')
+
+# Per-tier limits: max concurrent Metasploit jobs and a time budget in seconds
+# (0 = no budget). Bruteforce is rate-limited to a single job at a time.
+DEFAULT_TIER_LIMITS: Dict[str, Dict[str, int]] = {
+    'safe': {'concurrency': 8, 'timeout': 600},
+    'vuln': {'concurrency': 4, 'timeout': 1200},
+    'bruteforce': {'concurrency': 1, 'timeout': 3600},
+}
+
+# Modules with a missing or unrecognized flag are treated as the most
+# conservative tier rather than being run early.
+FALLBACK_TIER = 'bruteforce'
+
+
+def module_tier(mod: Dict[str, Any]) -> str:
+    """Return the tier name for a module descriptor."""
+    flag = (mod.get('flag') or '').strip().lower()
+    return flag if flag in TIER_ORDER else FALLBACK_TIER
+
+
+def parse_flags(text: str) -> List[str]:
+    """Parse a comma separated flag filter (e.g. "safe,vuln") into tier names,
+    kept in execution order. Raises ValueError on unknown flags.
+    """
+    wanted = {f.strip().lower() for f in (text or '').split(',') if f.strip()}
+    if not wanted:
+        raise ValueError('no flags given')
+    unknown = wanted - set(TIER_ORDER)
+    if unknown:
+        raise ValueError(f"unknown flag(s): {', '.join(sorted(unknown))} "
+                         f"(expected any of: {', '.join(TIER_ORDER)})")
+    return [t for t in TIER_ORDER if t in wanted]
+
+
+def parse_tier_limit(text: str) -> Tuple[str, Dict[str, int]]:
+    """Parse a TIER=CONCURRENCY[:SECONDS] override, e.g. "bruteforce=2:1800".
+    Raises ValueError on malformed input.
+    """
+    tier, sep, spec = (text or '').partition('=')
+    tier = tier.strip().lower()
+    if not sep or tier not in TIER_ORDER:
+        raise ValueError(f"expected TIER=CONCURRENCY[:SECONDS] with TIER one of: {', '.join(TIER_ORDER)}")
+    conc, _, timeout = spec.partition(':')
+    try:
+        limits = {'concurrency': int(conc)}
+        if timeout:
+            limits['timeout'] = int(timeout)
+    except ValueError:
+        raise ValueError(f"invalid limits '{spec}' for tier '{tier}'")
+    if limits['concurrency'] < 1 or limits.get('timeout', 0) < 0:
+        raise ValueError(f"invalid limits '{spec}' for tier '{tier}'")
+    return tier, limits
+
+
+def resolve_tier_limits(overrides: Optional[Iterable[Tuple[str, Dict[str, int]]]] = None) -> Dict[str, Dict[str, int]]:
+    """Return the default tier limits with any (tier, limits) overrides applied."""
+    limits = {tier: dict(vals) for tier, vals in DEFAULT_TIER_LIMITS.items()}
+    for tier, vals in overrides or []:
+        limits[tier].update(vals)
+    return limits
+
+
+def build_schedule(
+    hosts: List[Dict[str, Any]],
+    lookup: Dict[str, List[Dict[str, Any]]],
+    flags: Optional[Iterable[str]] = None
+) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Return [(tier, entries), ...] in execution order.
+
+    Each entry is {"ip", "port", "service", "product", "module"} where "module"
+    is the lookup descriptor. Within a tier, entries keep host and port order.
+    Tiers not in `flags` (default: all) and empty tiers are left out.
+    """
+    enabled = set(flags) if flags is not None else set(TIER_ORDER)
+    tiers: Dict[str, List[Dict[str, Any]]] = {t: [] for t in TIER_ORDER}
+
+    for host in hosts:
+        seen_module_port = set()
+        for p in host['ports']:
+            port = p['port']
+            svc = p.get('service', '')
+            for mod in find_modules_for_service(lookup, svc):
+                # avoid repeating identical module+port combos
+                key = (mod.get('module'), port)
+                if key in seen_module_port:
+                    continue
+                seen_module_port.add(key)
+                tier = module_tier(mod)
+                if tier not in enabled:
+                    continue
+                tiers[tier].append({'ip': host['ip'], 'port': port, 'service': svc,
+                                    'product': p.get('product', ''), 'module': mod})
+
+    return [(t, tiers[t]) for t in TIER_ORDER if tiers[t]]
+
+
+def find_unmapped_services(
+    hosts: List[Dict[str, Any]],
+    lookup: Dict[str, List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """Return {"ip", "port", "service"} for every open port whose service has
+    no module mapping in the lookup, in host and port order.
+    """
+    return [{'ip': host['ip'], 'port': p['port'], 'service': p.get('service', '')}
+            for host in hosts for p in host['ports']
+            if not find_modules_for_service(lookup, p.get('service', ''))]
@@ -0,0 +1,189 @@
+"""watcher.py
+Watch a directory of in-progress Nmap XML outputs and hand over finished
+hosts as soon as their <host> element has been written.
+"""
+import os
+import re
+import threading
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, List, Optional, Set
+from libs.nmap_parser import CHUNK_SIZE, NmapStreamParser
+
+HostsCallback = Callable[[str, List[Dict]], None]
+
+# Leading bytes remembered per file to notice rewrites in place; Nmap's
+# <nmaprun ... start="..."> header differs between runs.
+HEAD_SIZE = 1024
+
+
+class _TrackedFile:
+    """Read offset and parser state for one watched XML file."""
+
+    def __init__(self, ino: int = 0):
+        self.offset = 0
+        self.parser = NmapStreamParser()
+        self.failed = False
+        self.ino = ino
+        self.head = b''
+
+
+def _was_rewritten(path: str, state: _TrackedFile, ino: int, size: int) -> bool:
+    """Return True if the file at `path` is no longer the one `state` tracked
+    (replaced, truncated, or rewritten in place with different leading bytes).
+    """
+    if ino != state.ino or size < state.offset:
+        return True
+    if not state.head:
+        return False
+    with open(path, 'rb') as fh:
+        return fh.read(len(state.head)) != state.head
+
+
+class ShardWriter:
+    """HostsCallback that writes each batch of new hosts to its own .rc shard
+    (<out_dir>/<scan>_NNN.rc) via write_fn(hosts, shard_path).
+
+    Numbering continues after the highest shard already on disk, and hosts
+    already written to an existing shard of the same scan are skipped, so a
+    restarted watcher or a re-parsed file never overwrites or repeats work.
+    """
+
+    # trailer appended to every shard listing the hosts it covers
+    _HOSTS_PREFIX = '# Shard hosts: '
+
+    def __init__(self, out_dir: str, write_fn: Callable[[List[Dict], str], Any]):
+        self.out_dir = out_dir
+        self.write_fn = write_fn
+        self._counts: Dict[str, int] = {}
+        self._emitted: Dict[str, Set[str]] = {}
+
+    def _load_existing(self, stem: str) -> None:
+        """Pick up shard numbers and host IPs from shards left by earlier runs."""
+        pattern = re.compile(rf'^{re.escape(stem)}_(\d+)\.rc$')
+        count = 0
+        emitted: Set[str] = set()
+        for name in os.listdir(self.out_dir):
+            m = pattern.match(name)
+            if not m:
+                continue
+            count = max(count, int(m.group(1)))
+            with open(os.path.join(self.out_dir, name), 'r', encoding='utf-8') as fh:
+                for line in fh:
+                    if line.startswith(self._HOSTS_PREFIX):
+                        emitted.update(line[len(self._HOSTS_PREFIX):].split())
+        self._counts[stem] = count
+        self._emitted[stem] = emitted
+
+    def _stem(self, xml_path: str) -> str:
+        stem = os.path.splitext(os.path.basename(xml_path))[0]
+        if stem not in self._counts:
+            self._load_existing(stem)
+        return stem
+
+    def reset(self, xml_path: str) -> None:
+        """Called by poll_directory when `xml_path` was rewritten by a new scan:
+        forget which hosts were emitted for it so the new results get shards.
+        Shard numbering carries on.
+        """
+        self._emitted[self._stem(xml_path)] = set()
+
+    def __call__(self, xml_path: str, hosts: List[Dict]) -> Optional[str]:
+        stem = self._stem(xml_path)
+        emitted = self._emitted[stem]
+        new_hosts = [h for h in hosts if h['ip'] not in emitted]
+        if not new_hosts:
+            return None
+        self._counts[stem] += 1
+        shard = os.path.join(self.out_dir, f"{stem}_{self._counts[stem]:03d}.rc")
+        self.write_fn(new_hosts, shard)
+        with open(shard, 'a', encoding='utf-8') as fh:
+            fh.write(f"\n{self._HOSTS_PREFIX}{' '.join(h['ip'] for h in new_hosts)}\n")
+        emitted.update(h['ip'] for h in new_hosts)
+        print(f"Wrote .rc shard for {len(new_hosts)} new host(s) to: {shard}")
+        return shard
+
+
+def poll_directory(directory: str, tracked: Dict[str, _TrackedFile], on_hosts: HostsCallback) -> None:
+    """Run a single polling pass over `directory`.
+
+    Only files whose size changed since the last pass are read, and only the
+    new bytes are fed to that file's stream parser. A file that was replaced
+    (new inode), shrank, or whose leading bytes changed is treated as a new
+    scan and parsed again from the start; if `on_hosts` has a reset(xml_path)
+    method (e.g. ShardWriter) it is called first.
+    """
+    try:
+        entries = [e for e in os.scandir(directory) if e.is_file() and e.name.lower().endswith('.xml')]
+    except FileNotFoundError:
+        return
+
+    for entry in sorted(entries, key=lambda e: e.name):
+        try:
+            st = os.stat(entry.path)
+        except FileNotFoundError:
+            continue
+
+        state = tracked.get(entry.path)
+        if state is None:
+            state = tracked[entry.path] = _TrackedFile(st.st_ino)
+        elif state.offset and st.st_size != state.offset:
+            try:
+                rewritten = _was_rewritten(entry.path, state, st.st_ino, st.st_size)
+            except OSError:
+                continue
+            if rewritten:
+                state = tracked[entry.path] = _TrackedFile(st.st_ino)
+                reset = getattr(on_hosts, 'reset', None)
+                if callable(reset):
+                    reset(entry.path)
+        if state.failed or st.st_size == state.offset:
+            continue
+
+        hosts = []
+        try:
+            with open(entry.path, 'rb') as fh:
+                fh.seek(state.offset)
+                for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                    if len(state.head) < HEAD_SIZE:
+                        state.head = (state.head + chunk)[:HEAD_SIZE]
+                    state.offset += len(chunk)
+                    hosts.extend(state.parser.feed(chunk))
+        except OSError as e:
+            print(f"[!] Could not read {entry.path}: {e}")
+        except ET.ParseError as e:
+            # not Nmap XML (or corrupted); ignore until the file is rewritten
+            print(f"[!] Failed parsing {entry.path}: {e} — ignoring until it is rewritten")
+            state.failed = True
+
+        if hosts:
+            on_hosts(entry.path, hosts)
+
+
+def watch_directory(
+    directory: str,
+    on_hosts: HostsCallback,
+    interval: float = 2.0,
+    stop_event: Optional[threading.Event] = None
+) -> None:
+    """Poll `directory` for new or growing Nmap XML files until `stop_event`
+    is set (or forever), calling on_hosts(xml_path, hosts) for every batch of
+    newly finished hosts.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    tracked: Dict[str, _TrackedFile] = {}
+    while not stop_event.is_set():
+        poll_directory(directory, tracked, on_hosts)
+        stop_event.wait(interval)
+
+
+if __name__ == '__main__':
+    # Example manual test: print hosts as they show up in ../test xml files
+    def _show(path, hosts):
+        for h in hosts:
+            print(path, h['ip'], [p['port'] for p in h['ports']])
+
+    try:
+        watch_directory('../test xml files', _show)
+    except KeyboardInterrupt:
+        pass
@@ -8,16 +8,51 @@ from libs.module_lookup import load_lookup
 from libs.rc_writer import write_rc
 from libs.ask_ai import generate_ai_modules
 from libs.interactive import interactive_select_modules
+from libs.watcher import ShardWriter, watch_directory
+from libs.scheduler import TIER_ORDER, parse_flags, parse_tier_limit, resolve_tier_limits
+
+
+def _argtype(parser_fn):
+    """Wrap a ValueError-raising parser so argparse reports a clean usage error."""
+    def wrapped(text):
+        try:
+            return parser_fn(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return wrapped
+
+
+def _positive_float(text):
+    value = float(text)
+    if value <= 0:
+        raise ValueError(f"must be greater than 0, got {text}")
+    return value
 
 
 def main():
     p = argparse.ArgumentParser(description='Generate Metasploit .rc from Nmap XML (modular)')
-    p.add_argument('-i', '--input', required=True, help='Nmap XML file')
-    p.add_argument('-o', '--output', required=False, help='Output .rc file')
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument('-i', '--input', help='Nmap XML file')
+    src.add_argument('-w', '--watch', metavar='DIR',
+                     help='Watch a directory of in-progress Nmap XML files and write .rc shards as hosts finish')
+    p.add_argument('-o', '--output', required=False, help='Output .rc file (output directory in --watch mode)')
+    p.add_argument('--interval', type=_argtype(_positive_float), default=2.0, help='Polling interval in seconds for --watch (default: 2)')
     p.add_argument('--lookup', help='Path to module_lookup.json (optional)')
     p.add_argument('-s','--ai-support', help='Enable AI-provided modules', action='store_true')
-    p.add_argument('-c','--interactive', help='Interactive mode to manually select modules', action='store_true')
+    p.add_argument('-c','--interactive', help='Interactive mode to manually select modules (not available with --watch)', action='store_true')
+    p.add_argument('--flags', type=_argtype(parse_flags), default=list(TIER_ORDER),
+                   help='Comma separated module flags to include, run in this order: safe,vuln,bruteforce (default: all)')
+    p.add_argument('--tier-limit', type=_argtype(parse_tier_limit), action='append', default=[],
+                   metavar='TIER=JOBS[:SECONDS]',
+                   help='Override max concurrent jobs and time budget for a tier, e.g. bruteforce=2:1800 (repeatable)')
     args = p.parse_args()
+    if args.watch and args.interactive:
+        p.error('argument -c/--interactive: not allowed with argument -w/--watch')
+    if args.watch and not os.path.isdir(args.watch):
+        p.error(f"argument -w/--watch: '{args.watch}' is not a directory")
+    if args.watch and args.output and os.path.exists(args.output) and not os.path.isdir(args.output):
+        p.error(f"argument -o/--output: '{args.output}' exists and is not a directory (watch mode writes shards into a directory)")
+    tier_limits = resolve_tier_limits(args.tier_limit)
 
 
 
@@ -41,6 +76,27 @@ def main():
     elif not args.lookup:
         used_default_lookup = True
 
+    if args.watch:
+        o(f"[*] Watching directory: {args.watch}")
+        o(f"[*] Output directory: {args.output or '.'}")
+        o(f"[*] Using default lookup file: {'yes' if used_default_lookup else 'no'}")
+        o(f"[*] Module flags: {', '.join(args.flags)}\n\r")
+        # no service list is known up front, so AI support only reuses a cached ai_lookup.json
+        lookup = load_lookup(lookup_path, ai_support=args.ai_support)
+        if lookup is None:
+            print(f"[!] No modules found in lookup file: {lookup_path}. Please create or populate '{default_lookup}' and try again.")
+            return
+        out_dir = args.output or '.'
+        os.makedirs(out_dir, exist_ok=True)
+        write_shard = ShardWriter(out_dir, lambda new_hosts, shard: write_rc(
+            new_hosts, lookup, shard, flags=args.flags, tier_limits=tier_limits))
+
+        try:
+            watch_directory(args.watch, write_shard, interval=args.interval)
+        except KeyboardInterrupt:
+            print('\n[i] Stopped watching.')
+        return
+
     # determine output filename (so we can print it now)
     computed_output = args.output if args.output else f"{os.path.splitext(os.path.basename(args.input))[0]}.rc"
 
@@ -48,7 +104,8 @@ def main():
     o(f"[*] Input file: {args.input}")
     o(f"[*] Output file: {computed_output}")
     o(f"[*] Using default lookup file: {'yes' if used_default_lookup else 'no'}")
-    o(f"[*] AI support enabled: {'yes' if args.ai_support else 'no'}\n\r")
+    o(f"[*] AI support enabled: {'yes' if args.ai_support else 'no'}")
+    o(f"[*] Module flags: {', '.join(args.flags)}\n\r")
 
     # parse nmap xml
     hosts = list(parse_nmap_xml(args.input))
@@ -94,7 +151,7 @@ def main():
 
 
     # ---- proceed to write .rc ----
-    out = write_rc(hosts, lookup, computed_output)
+    out = write_rc(hosts, lookup, computed_output, flags=args.flags, tier_limits=tier_limits)
     print(f'Wrote .rc to: {out}')
 
 
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# make `libs` importable when running pytest from anywhere
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
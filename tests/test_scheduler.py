@@ -0,0 +1,123 @@
+import pytest
+
+from libs.rc_writer import generate_rc_for_tier
+from libs.scheduler import (DEFAULT_TIER_LIMITS, build_schedule, find_unmapped_services, parse_flags,
+                            parse_tier_limit, resolve_tier_limits)
+
+LOOKUP = {
+    'ftp': [
+        {'module': 'auxiliary/scanner/ftp/ftp_login', 'flag': 'bruteforce'},
+        {'module': 'auxiliary/scanner/ftp/ftp_version', 'flag': 'safe'},
+        {'module': 'auxiliary/scanner/ftp/vsftpd_check', 'flag': 'vuln'},
+        {'module': 'auxiliary/scanner/ftp/mystery'},
+        {'module': 'auxiliary/scanner/ftp/odd', 'flag': 'aggressive'},
+    ],
+    'http': [{'module': 'auxiliary/scanner/http/http_version', 'flag': 'safe'}],
+}
+
+HOSTS = [
+    {'ip': '10.0.0.1', 'ports': [{'port': 21, 'service': 'ftp'}, {'port': 80, 'service': 'http'}]},
+    {'ip': '10.0.0.2', 'ports': [{'port': 21, 'service': 'ftp'}, {'port': 9, 'service': 'discard'}]},
+]
+
+
+def _modules(entries):
+    return [(e['ip'], e['module']['module']) for e in entries]
+
+
+def test_parse_flags_keeps_execution_order():
+    assert parse_flags('bruteforce, SAFE') == ['safe', 'bruteforce']
+    assert parse_flags('vuln,vuln') == ['vuln']
+
+
+@pytest.mark.parametrize('text', ['', ' , ', 'safe,aggressive'])
+def test_parse_flags_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_flags(text)
+
+
+def test_parse_tier_limit():
+    assert parse_tier_limit('bruteforce=2:1800') == ('bruteforce', {'concurrency': 2, 'timeout': 1800})
+    assert parse_tier_limit('Safe=4') == ('safe', {'concurrency': 4})
+    assert parse_tier_limit('vuln=1:0') == ('vuln', {'concurrency': 1, 'timeout': 0})
+
+
+@pytest.mark.parametrize('text', ['safe', 'loud=2', 'safe=', 'safe=0', 'safe=x', 'safe=2:y', 'safe=2:-1', '=2'])
+def test_parse_tier_limit_rejects_bad_input(text):
+    with pytest.raises(ValueError):
+        parse_tier_limit(text)
+
+
+def test_resolve_tier_limits_merges_overrides():
+    limits = resolve_tier_limits([('safe', {'concurrency': 2}), ('bruteforce', {'concurrency': 3, 'timeout': 0})])
+    assert limits['safe'] == {'concurrency': 2, 'timeout': DEFAULT_TIER_LIMITS['safe']['timeout']}
+    assert limits['bruteforce'] == {'concurrency': 3, 'timeout': 0}
+    assert limits['vuln'] == DEFAULT_TIER_LIMITS['vuln']
+    # defaults are not mutated
+    assert DEFAULT_TIER_LIMITS['safe']['concurrency'] == 8
+
+
+def test_build_schedule_orders_tiers_across_hosts():
+    schedule = build_schedule(HOSTS, LOOKUP)
+    assert [tier for tier, _ in schedule] == ['safe', 'vuln', 'bruteforce']
+    safe, vuln, brute = (entries for _, entries in schedule)
+    assert _modules(safe) == [('10.0.0.1', 'auxiliary/scanner/ftp/ftp_version'),
+                              ('10.0.0.1', 'auxiliary/scanner/http/http_version'),
+                              ('10.0.0.2', 'auxiliary/scanner/ftp/ftp_version')]
+    assert _modules(vuln) == [('10.0.0.1', 'auxiliary/scanner/ftp/vsftpd_check'),
+                              ('10.0.0.2', 'auxiliary/scanner/ftp/vsftpd_check')]
+    # missing and unknown flags fall back to bruteforce
+    assert [m for ip, m in _modules(brute) if ip == '10.0.0.1'] == [
+        'auxiliary/scanner/ftp/ftp_login', 'auxiliary/scanner/ftp/mystery', 'auxiliary/scanner/ftp/odd']
+
+
+def test_build_schedule_filters_by_flags():
+    schedule = build_schedule(HOSTS, LOOKUP, ['vuln'])
+    assert [tier for tier, _ in schedule] == ['vuln']
+    assert build_schedule(HOSTS, {'http': LOOKUP['http']}, ['bruteforce']) == []
+
+
+def test_build_schedule_dedupes_module_and_port_per_host():
+    host = {'ip': '10.0.0.1', 'ports': [{'port': 21, 'service': 'ftp'}, {'port': 21, 'service': 'ftp'},
+                                        {'port': 2121, 'service': 'ftp'}]}
+    lookup = {'ftp': [LOOKUP['ftp'][1], dict(LOOKUP['ftp'][1])]}
+    (tier, entries), = build_schedule([host], lookup)
+    assert [e['port'] for e in entries] == [21, 2121]
+
+
+def test_find_unmapped_services():
+    assert find_unmapped_services(HOSTS, LOOKUP) == [{'ip': '10.0.0.2', 'port': 9, 'service': 'discard'}]
+
+
+def _tier_rc(timeout):
+    (tier, entries), = build_schedule(HOSTS[:1], {'http': LOOKUP['http']})
+    return generate_rc_for_tier(tier, entries, 3, timeout).splitlines()
+
+
+def test_tier_rc_throttles_and_drains_only_its_own_jobs():
+    lines = _tier_rc(600)
+    assert '$nmap2msf_deadline = Time.now + 600' in lines
+    assert '$nmap2msf_jobs = []' in lines
+    in_budget = '($nmap2msf_deadline.nil? || Time.now < $nmap2msf_deadline)'
+    own_jobs = '($nmap2msf_jobs & framework.jobs.keys)'
+    assert f'sleep(1) while {own_jobs}.length >= 3 && {in_budget}' in lines
+    run = lines.index("  run_single('run -j')")
+    assert lines[run - 1] == '  before = framework.jobs.keys'
+    assert lines[run + 1] == '  $nmap2msf_jobs.concat(framework.jobs.keys - before)'
+    assert f'sleep(1) while !{own_jobs}.empty? && {in_budget}' in lines
+    assert f'{own_jobs}.each {{ |id| framework.jobs.stop_job(id) }}' in lines
+    # nothing touches the framework's job list as a whole
+    assert not any('framework.jobs.length' in l or 'framework.jobs.empty?' in l for l in lines)
+
+
+def test_tier_rc_sets_rport_after_use():
+    lines = _tier_rc(600)
+    use = lines.index('use auxiliary/scanner/http/http_version')
+    assert lines[use + 1] == 'set RPORT 80'
+
+
+def test_tier_rc_without_budget_has_nil_deadline():
+    lines = _tier_rc(0)
+    assert '$nmap2msf_deadline = nil' in lines
+    assert not any('Time.now +' in l for l in lines)
+    assert lines[0].endswith('time budget: none) ==========')
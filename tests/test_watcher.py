@@ -0,0 +1,179 @@
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import pytest
+
+from libs.nmap_parser import NmapStreamParser, _parse_host, parse_nmap_xml
+from libs.watcher import ShardWriter, poll_directory
+
+SAMPLES = sorted((Path(__file__).resolve().parent.parent / 'test xml files').glob('*.xml'))
+
+
+def _tree_hosts(path):
+    """Reference result: parse the whole tree at once."""
+    hosts = (_parse_host(h) for h in ET.parse(path).getroot().findall('host'))
+    return [h for h in hosts if h]
+
+
+def _collect():
+    seen = []
+    return seen, lambda path, hosts: seen.extend(h['ip'] for h in hosts)
+
+
+@pytest.mark.parametrize('sample', SAMPLES, ids=lambda p: p.name)
+@pytest.mark.parametrize('chunk', [1, 7, 4096])
+def test_chunked_feed_matches_tree_parse(sample, chunk):
+    data = sample.read_bytes()
+    parser = NmapStreamParser()
+    hosts = []
+    for i in range(0, len(data), chunk):
+        hosts.extend(parser.feed(data[i:i + chunk]))
+    hosts.extend(parser.close())
+    assert hosts == _tree_hosts(sample)
+
+
+@pytest.mark.parametrize('sample', SAMPLES, ids=lambda p: p.name)
+def test_parse_nmap_xml_matches_tree_parse(sample):
+    assert list(parse_nmap_xml(str(sample))) == _tree_hosts(sample)
+
+
+def test_stream_parser_drops_finished_top_level_elements():
+    parser = NmapStreamParser()
+    parser.feed(b'<nmaprun>' + b'<taskprogress task="SYN"/>' * 100)
+    assert len(parser._root) == 0
+
+
+def test_growing_file_reports_each_host_once(tmp_path):
+    sample = max(SAMPLES, key=lambda p: len(_tree_hosts(p)))
+    data = sample.read_bytes()
+    target = tmp_path / 'scan.xml'
+    tracked, (seen, cb) = {}, _collect()
+
+    step = len(data) // 9 + 1
+    with open(target, 'wb') as fh:
+        for i in range(0, len(data), step):
+            fh.write(data[i:i + step])
+            fh.flush()
+            poll_directory(str(tmp_path), tracked, cb)
+    poll_directory(str(tmp_path), tracked, cb)
+
+    assert seen == [h['ip'] for h in _tree_hosts(sample)]
+
+
+def test_shrunk_file_is_parsed_again(tmp_path):
+    sample = SAMPLES[0]
+    data = sample.read_bytes()
+    target = tmp_path / 'scan.xml'
+    tracked, (seen, cb) = {}, _collect()
+
+    target.write_bytes(data)
+    poll_directory(str(tmp_path), tracked, cb)
+    target.write_bytes(data[:len(data) // 3])
+    poll_directory(str(tmp_path), tracked, cb)
+    target.write_bytes(data)
+    poll_directory(str(tmp_path), tracked, cb)
+
+    expected = [h['ip'] for h in _tree_hosts(sample)]
+    assert seen == expected * 2
+    assert not tracked[str(target)].failed
+
+
+def test_rewrite_growing_past_old_offset_is_detected(tmp_path):
+    small, large = sorted(SAMPLES, key=lambda p: p.stat().st_size)[:2]
+    target = tmp_path / 'scan.xml'
+    tracked, (seen, cb) = {}, _collect()
+
+    target.write_bytes(small.read_bytes()[:small.stat().st_size // 2])
+    poll_directory(str(tmp_path), tracked, cb)
+    # a new run rewrites the same path and grows past the old offset before the next poll
+    data = large.read_bytes().replace(b'start="', b'start="9', 1)
+    target.write_bytes(data)
+    poll_directory(str(tmp_path), tracked, cb)
+
+    assert seen[-len(_tree_hosts(large)):] == [h['ip'] for h in _tree_hosts(large)]
+    assert not tracked[str(target)].failed
+
+
+def test_malformed_file_is_ignored(tmp_path, capsys):
+    target = tmp_path / 'junk.xml'
+    tracked, (seen, cb) = {}, _collect()
+
+    target.write_bytes(b'not xml <<')
+    poll_directory(str(tmp_path), tracked, cb)
+    with open(target, 'ab') as fh:
+        fh.write(b' still not xml')
+    poll_directory(str(tmp_path), tracked, cb)
+
+    assert seen == []
+    assert tracked[str(target)].failed
+    assert 'Failed parsing' in capsys.readouterr().out
+
+
+def test_shard_writer_continues_numbering_and_skips_emitted_hosts(tmp_path):
+    def write_fn(hosts, path):
+        Path(path).write_text('# shard\n', encoding='utf-8')
+
+    hosts = [{'ip': '10.0.0.1', 'ports': []}, {'ip': '10.0.0.2', 'ports': []}]
+    first = ShardWriter(str(tmp_path), write_fn)
+    assert first('/scans/scan.xml', hosts[:1]).endswith('scan_001.rc')
+    assert first('/scans/scan.xml', hosts[:1]) is None
+
+    # a restarted watcher re-reads the file from the start
+    second = ShardWriter(str(tmp_path), write_fn)
+    shard = second('/scans/scan.xml', hosts)
+    assert os.path.basename(shard) == 'scan_002.rc'
+    assert Path(shard).read_text(encoding='utf-8').splitlines()[-1] == '# Shard hosts: 10.0.0.2'
+    assert sorted(os.listdir(tmp_path)) == ['scan_001.rc', 'scan_002.rc']
+
+
+def test_shard_writer_emits_rewritten_scan_again(tmp_path):
+    scans, out = tmp_path / 'scans', tmp_path / 'out'
+    scans.mkdir()
+    out.mkdir()
+    sample = max(SAMPLES, key=lambda p: len(_tree_hosts(p)))
+    data = sample.read_bytes()
+    target = scans / 'scan.xml'
+    written = []
+
+    def write_fn(hosts, path):
+        written.append([h['ip'] for h in hosts])
+        Path(path).write_text('# shard\n', encoding='utf-8')
+
+    writer, tracked = ShardWriter(str(out), write_fn), {}
+    target.write_bytes(data)
+    poll_directory(str(scans), tracked, writer)
+    target.write_bytes(data[:len(data) // 3])
+    poll_directory(str(scans), tracked, writer)
+    before = len(written)
+    # a new Nmap run rewrites the same -oX path
+    target.write_bytes(data.replace(b'start="', b'start="9', 1))
+    poll_directory(str(scans), tracked, writer)
+
+    expected = [h['ip'] for h in _tree_hosts(sample)]
+    assert written[0] == expected
+    assert written[before:] == [expected]
+    assert len(os.listdir(out)) == len(written)
+
+
+def test_poll_reads_in_bounded_chunks(tmp_path, monkeypatch):
+    import libs.watcher as watcher
+
+    sizes = []
+
+    class RecordingParser(NmapStreamParser):
+        def feed(self, data):
+            sizes.append(len(data))
+            return super().feed(data)
+
+    monkeypatch.setattr(watcher, 'CHUNK_SIZE', 256)
+    monkeypatch.setattr(watcher, 'NmapStreamParser', RecordingParser)
+    sample = max(SAMPLES, key=lambda p: p.stat().st_size)
+    (tmp_path / 'scan.xml').write_bytes(sample.read_bytes())
+    tracked, (seen, cb) = {}, _collect()
+
+    poll_directory(str(tmp_path), tracked, cb)
+
+    assert max(sizes) <= 256 and sum(sizes) == sample.stat().st_size
+    assert tracked[str(tmp_path / 'scan.xml')].head == sample.read_bytes()[:watcher.HEAD_SIZE]
+    assert seen == [h['ip'] for h in _tree_hosts(sample)]